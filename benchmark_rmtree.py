@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the parallel tree remover against shutil.rmtree on a synthetic tree
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from clean_mac import parallel_rmtree
+
+
+def build_tree(root, files, files_per_dir=100, fanout=10):
+    """Create a DerivedData-style tree with the given number of small files"""
+    os.makedirs(root)
+    created = 0
+    pending = [root]
+    while created < files:
+        directory = pending.pop(0)
+        for i in range(min(files_per_dir, files - created)):
+            with open(os.path.join(directory, f"obj{i}.o"), "wb") as f:
+                f.write(b"x")
+            created += 1
+        for i in range(fanout):
+            sub = os.path.join(directory, f"dir{i}")
+            os.mkdir(sub)
+            pending.append(sub)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--files', type=int, default=1_000_000,
+                        help="number of files in the synthetic tree (default: 1,000,000)")
+    parser.add_argument('--workers', default="1,2,4,8,16",
+                        help="comma-separated worker counts to try")
+    parser.add_argument('--dir', default=None,
+                        help="where to build the tree (default: system temp directory)")
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix="rmtree-bench-", dir=args.dir)
+    runs = [('shutil.rmtree', None)] + [(f"{n} worker(s)", int(n)) for n in args.workers.split(',')]
+
+    print(f"Removing {args.files:,} files under {base}")
+    print("=" * 60)
+    try:
+        baseline = None
+        for label, workers in runs:
+            root = os.path.join(base, "tree")
+            build_tree(root, args.files)
+
+            start = time.perf_counter()
+            if workers is None:
+                shutil.rmtree(root)
+            else:
+                result = parallel_rmtree(root, workers)
+                if result.errors:
+                    print(f"  ⚠ {len(result.errors)} errors")
+            elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            print(f"  {label:<16} {elapsed:>8.2f} s  {args.files / elapsed:>12,.0f} files/s"
+                  f"  ({baseline / elapsed:.2f}x)")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,12 @@ Basic tests for Mac Cleaner script
 """
 
 import unittest
+import io
+import json
 import sys
 import os
+import threading
+import time
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -51,7 +55,967 @@ class TestMacCleaner(unittest.TestCase):
         self.assertIsInstance(leftover_files, list)
         self.assertIsInstance(total_size, (int, float))
         self.assertGreaterEqual(total_size, 0)
+    
+    def test_parse_app_selection(self):
+        """Test parse_app_selection with numbers, ranges, filters and 'all'"""
+        apps = ["/Applications/Alpha.app", "/Applications/Beta.app",
+                "/Applications/Slack.app", "/Users/me/Applications/Slacker.app"]
+        self.assertEqual(clean_mac.parse_app_selection("2", apps), [1])
+        self.assertEqual(clean_mac.parse_app_selection("1, 3-4", apps), [0, 2, 3])
+        self.assertEqual(clean_mac.parse_app_selection("/slack", apps), [2, 3])
+        self.assertEqual(clean_mac.parse_app_selection("all", apps), [0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            clean_mac.parse_app_selection("5", apps)
+        with self.assertRaises(ValueError):
+            clean_mac.parse_app_selection("abc", apps)
+    
+    def test_removal_helper_batches(self):
+        """Test RemovalHelper with an unprivileged local stand-in process"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            command = [sys.executable, clean_mac.__file__, clean_mac.REMOVAL_HELPER_FLAG, tmpdir]
+            targets = []
+            for name in ("One.app", "Two.app", "Three.app"):
+                app_dir = os.path.join(tmpdir, name, "Contents")
+                os.makedirs(app_dir)
+                with open(os.path.join(app_dir, "Info.plist"), "w") as f:
+                    f.write("x")
+                targets.append(os.path.join(tmpdir, name))
+            missing = os.path.join(tmpdir, "Missing.app")
+            
+            with clean_mac.RemovalHelper(command) as helper:
+                results = {r['path']: r for r in helper.remove(targets[:2] + [missing])}
+                # The same helper process serves later batches too
+                results.update({r['path']: r for r in helper.remove(targets[2:])})
+            
+            for target in targets:
+                self.assertTrue(results[target]['ok'])
+                self.assertFalse(os.path.exists(target))
+            self.assertFalse(results[missing]['ok'])
+    
+    def test_removal_helper_abandoned_batch(self):
+        """Test that a batch abandoned mid-iteration does not leak into the next one"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            command = [sys.executable, clean_mac.__file__, clean_mac.REMOVAL_HELPER_FLAG, tmpdir]
+            first = [os.path.join(tmpdir, f"Old{i}.app") for i in range(5)]
+            second = os.path.join(tmpdir, "New.app")
+            for path in first + [second]:
+                open(path, "w").close()
+            
+            with clean_mac.RemovalHelper(command) as helper:
+                with self.assertRaises(KeyError):
+                    for record in helper.remove(first):
+                        raise KeyError(record['path'])
+                results = list(helper.remove([second]))
+            
+            self.assertEqual([r['path'] for r in results], [second])
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_removal_helper_refuses_paths_outside_apps_dir(self):
+        """Test that the privileged helper only removes .app bundles in its apps directory"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            apps_dir = os.path.join(tmpdir, "Applications")
+            os.makedirs(os.path.join(apps_dir, "Nested", "Deep.app"))
+            refused = [os.path.join(tmpdir, "Outside.app"), os.path.join(apps_dir, "notes.txt"),
+                       os.path.join(apps_dir, "Nested", "Deep.app"),
+                       os.path.join(apps_dir, "..", "Outside.app"), "Relative.app", "/"]
+            for path in refused[:2]:
+                open(os.path.normpath(path), "w").close()
+            allowed = os.path.join(apps_dir, "Good.app")
+            os.makedirs(os.path.join(allowed, "Contents"))
+            
+            requests = "".join(json.dumps(path) + "\n" for path in refused + [allowed]) + "\n"
+            output = io.StringIO()
+            clean_mac.run_removal_helper(io.StringIO(requests), output, apps_dir=apps_dir)
+            results = {r['path']: r['ok'] for r in map(json.loads, output.getvalue().splitlines())
+                       if 'path' in r}
+            
+            self.assertEqual(results, {**{path: False for path in refused}, allowed: True})
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "Outside.app")))
+            self.assertTrue(os.path.exists(os.path.join(apps_dir, "notes.txt")))
+            self.assertTrue(os.path.isdir(os.path.join(apps_dir, "Nested", "Deep.app")))
+            self.assertFalse(os.path.exists(allowed))
+
+    
+    def test_progress_reporter_quiet_and_log_file(self):
+        """Test that quiet mode hides info lines and details go to the log file"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_path = os.path.join(tmpdir, "clean.log")
+            stream = io.StringIO()
+            reporter = clean_mac.ProgressReporter(stream=stream, log_path=log_path, quiet=True)
+            reporter.start("Test", total_items=2)
+            reporter.advance(nbytes=1024, detail="Removed first")
+            reporter.advance(nbytes=1024, detail="Removed second")
+            reporter.finish()
+            reporter.info("summary line")
+            reporter.warn("warning line")
+            reporter.close()
+            
+            output = stream.getvalue()
+            self.assertNotIn("summary line", output)
+            self.assertNotIn("Removed first", output)
+            self.assertIn("warning line", output)
+            with open(log_path) as f:
+                log = f.read()
+            self.assertIn("Removed first", log)
+            self.assertIn("Removed second", log)
+    
+    def test_progress_reporter_rate_limits_status_line(self):
+        """Test that the live status line is redrawn at most once per interval"""
+        class TtyStream(io.StringIO):
+            def isatty(self):
+                return True
+        
+        stream = TtyStream()
+        reporter = clean_mac.ProgressReporter(stream=stream, min_interval=60)
+        reporter.start("Caches", total_items=1000)
+        for _ in range(1000):
+            reporter.advance(nbytes=4096)
+        reporter.finish()
+        self.assertEqual(stream.getvalue().count("⏳"), 1)
+        self.assertIn("1 items", stream.getvalue())
+    
+    def test_quiet_mode_shows_what_prompts_ask_about(self):
+        """Test that quiet mode still lists the files and apps a [y/N] prompt refers to"""
+        from unittest import mock
+        stream = io.StringIO()
+        reporter = clean_mac.ProgressReporter(stream=stream, quiet=True)
+        leftovers = [{'name': 'com.gone.app', 'location': 'Preferences',
+                      'path': '/nonexistent/com.gone.app', 'size': 1.5}]
+        asked = []
+        
+        def confirm(question):
+            asked.append(stream.getvalue())
+            return False
+        
+        with mock.patch.object(clean_mac, 'find_leftover_app_files', return_value=(leftovers, 1.5)):
+            clean_mac.clean_leftover_app_files({'items_removed': 0, 'space_freed': 0}, reporter, confirm)
+        self.assertIn("com.gone.app", asked[0])
+        
+        stream.seek(0)
+        stream.truncate()
+        apps = ["/Applications/Alpha.app", "/Applications/Beta.app"]
+        answers = iter(["2", "n", "q"])
+        with mock.patch.object(clean_mac, 'get_installed_apps', return_value=list(apps)), \
+                mock.patch.object(clean_mac, 'get_size_mb', return_value=1.0), \
+                mock.patch('builtins.input', lambda: next(answers)):
+            clean_mac.list_and_uninstall_apps(helper=mock.Mock(), reporter=reporter)
+        output = stream.getvalue()
+        self.assertIn("1. Alpha.app", output)
+        self.assertIn("Selected 1 app(s)", output)
+        self.assertIn("• Beta.app", output)
+        self.assertNotIn("Cancelled", output)
+    
+    def test_clean_directory_routes_through_reporter(self):
+        """Test that clean_directory output goes to the given reporter"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "junk.txt"), "w") as f:
+                f.write("x" * 2048)
+            stream = io.StringIO()
+            reporter = clean_mac.ProgressReporter(stream=stream)
+            stats = {'items_removed': 0, 'space_freed': 0}
+            clean_mac.clean_directory(tmpdir, "Junk", stats, reporter)
+            self.assertIn("✓ Junk: Cleaned", stream.getvalue())
+            self.assertEqual(stats['items_removed'], 1)
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    
+    def test_progress_totals_count_only_candidates(self):
+        """Test that a category's progress total covers only what will be removed"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as home:
+            caches = os.path.join(home, "Library", "Caches")
+            for name, size in (("com.example.big", 1024 * 1024), ("com.example.tiny", 10),
+                               ("com.apple.Safari", 1024 * 1024)):
+                os.makedirs(os.path.join(caches, name))
+                with open(os.path.join(caches, name, "blob"), "wb") as f:
+                    f.write(b"x" * size)
+            
+            starts = []
+            reporter = clean_mac.CallbackReporter(
+                on_event=lambda kind, payload: kind == 'start' and starts.append(payload))
+            with mock.patch.dict(os.environ, {'HOME': home}):
+                clean_mac.clean_user_caches(reporter=reporter)
+            self.assertEqual(starts, [{'category': "User Caches", 'total_items': 1,
+                                       'total_bytes': 1024 * 1024}])
+    
+    def test_size_history_growth_across_cleans(self):
+        """Test that growth rates account for bytes removed by cleaning"""
+        import tempfile
+        day = 86400
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = clean_mac.SizeHistory(os.path.join(tmpdir, "history.jsonl"))
+            start = 1_000_000_000
+            # 'fast' grows 100 bytes/day and is cleaned every run, 'slow' grows 10 bytes/day
+            history.append({'fast': 100, 'slow': 1000}, {'fast': 0}, timestamp=start)
+            history.append({'fast': 100, 'slow': 1010}, {'fast': 0}, timestamp=start + day)
+            history.append({'fast': 100, 'slow': 1020}, {'fast': 0}, timestamp=start + 2 * day)
+            
+            rates = history.growth_rates(window_days=30, now=start + 2 * day)
+            self.assertEqual([r['key'] for r in rates], ['fast', 'slow'])
+            self.assertAlmostEqual(rates[0]['rate'], 100)
+            self.assertAlmostEqual(rates[1]['rate'], 10)
+    
+    def test_size_history_compaction_keeps_rates(self):
+        """Test that downsampling old runs does not change the growth rate"""
+        import tempfile
+        day = 86400
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = clean_mac.SizeHistory(os.path.join(tmpdir, "history.jsonl"))
+            start = 1_000_000_000
+            # Four runs per day for twenty days
+            for i in range(80):
+                history.append({'cache': 1000 + 25 * i}, timestamp=start + i * day // 4)
+            now = start + 20 * day
+            before = history.growth_rates(window_days=30, now=now)[0]['rate']
+            
+            removed = history.compact(now=now)
+            self.assertGreater(removed, 0)
+            self.assertLess(len(history.load()), 80)
+            self.assertAlmostEqual(history.growth_rates(window_days=30, now=now)[0]['rate'], before, places=0)
+    
+    def test_size_history_stays_small(self):
+        """Test that the store caps entries per run and stays under max_bytes"""
+        import tempfile
+        from unittest import mock
+        hour = 3600
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "history.jsonl")
+            history = clean_mac.SizeHistory(path, max_bytes=64 * 1024)
+            start = 1_000_000_000
+            compactions = []
+            real_compact = history.compact
+            
+            def counting_compact(*args, **kwargs):
+                compactions.append(1)
+                return real_compact(*args, **kwargs)
+            
+            with mock.patch.object(history, "compact", counting_compact):
+                for run in range(500):
+                    sizes = {'User Caches': 0}
+                    for i in range(200):
+                        sizes[f"User Caches/com.example.app{i}"] = (i + 1) * 1000 + run * i
+                    sizes['User Caches'] = sum(sizes.values())
+                    history.append(sizes, timestamp=start + run * hour)
+            
+            self.assertLessEqual(os.path.getsize(path), 64 * 1024)
+            self.assertLess(len(compactions), 50)
+            latest = history.load()[-1]
+            self.assertEqual(len(latest['s']), 1 + history.max_entries)
+            self.assertIn("User Caches/com.example.app199", latest['s'])
+            rates = {r['key']: r['rate'] for r in history.growth_rates(now=start + 500 * hour)}
+            self.assertAlmostEqual(rates["User Caches/com.example.app199"], 199 * 24)
+    
+    def test_size_history_compact_keeps_latest_when_all_old(self):
+        """Test that compaction keeps the latest run when every run is over a year old"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = clean_mac.SizeHistory(os.path.join(tmpdir, "history.jsonl"))
+            start = 1_000_000_000
+            for i in range(3):
+                history.append({'cache': 100 + i}, timestamp=start + i)
+            self.assertEqual(history.compact(now=start + 400 * 86400), 2)
+            self.assertEqual([r['s'] for r in history.load()], [{'cache': 102}])
+    
+    def test_size_history_forecast(self):
+        """Test the free-space forecast ignores space recovered by cleaning"""
+        import tempfile
+        day = 86400
+        gb = 1024 ** 3
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = clean_mac.SizeHistory(os.path.join(tmpdir, "history.jsonl"))
+            start = 1_000_000_000
+            # 2 GB consumed per day, 1 GB recovered by each clean
+            history.append({}, free_bytes=50 * gb, free_after=51 * gb, timestamp=start)
+            history.append({}, free_bytes=49 * gb, free_after=50 * gb, timestamp=start + day)
+            forecast = history.forecast_free_space(window_days=30, now=start + day)
+            self.assertAlmostEqual(forecast['rate'], 2 * gb)
+            self.assertAlmostEqual(forecast['days_left'], 25)
+
+    
+    def _make_tree(self, root, depth=3, fanout=3, files=4):
+        """Create a synthetic tree and return its file and directory counts"""
+        file_count, dir_count = 0, 0
+        for i in range(files):
+            with open(os.path.join(root, f"f{i}"), "w") as f:
+                f.write("x")
+            file_count += 1
+        if depth:
+            for i in range(fanout):
+                sub = os.path.join(root, f"d{i}")
+                os.mkdir(sub)
+                sub_files, sub_dirs = self._make_tree(sub, depth - 1, fanout, files)
+                file_count += sub_files
+                dir_count += sub_dirs + 1
+        return file_count, dir_count
+    
+    def test_parallel_rmtree_removes_tree(self):
+        """Test that parallel_rmtree removes every file and directory bottom-up"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "DerivedData")
+            os.mkdir(root)
+            file_count, dir_count = self._make_tree(root)
+            os.symlink(tmpdir, os.path.join(root, "d0", "link-to-parent"))
+            
+            result = clean_mac.parallel_rmtree(root, workers=4)
+            self.assertTrue(result.ok)
+            self.assertEqual(result.files_removed, file_count + 1)
+            self.assertEqual(result.dirs_removed, dir_count + 1)
+            self.assertFalse(os.path.exists(root))
+            # The symlink was removed, not followed
+            self.assertTrue(os.path.isdir(tmpdir))
+    
+    def test_parallel_rmtree_small_trees_start_no_threads(self):
+        """Test that small trees are removed by the calling thread alone"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "SmallCache")
+            os.mkdir(root)
+            self._make_tree(root, depth=2)
+            with mock.patch.object(clean_mac.threading, "Thread") as thread:
+                result = clean_mac.parallel_rmtree(root, workers=8)
+            self.assertTrue(result.ok)
+            thread.assert_not_called()
+            self.assertFalse(os.path.exists(root))
+    
+    def test_parallel_rmtree_interrupt_stops_helpers(self):
+        """Test that helper threads end when the calling thread is interrupted"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "BigCache")
+            os.mkdir(root)
+            self._make_tree(root, depth=3, fanout=5, files=1)
+            real_worker = clean_mac.ParallelTreeRemover._worker
+            
+            def worker(remover, index):
+                if index == 0:
+                    raise KeyboardInterrupt
+                return real_worker(remover, index)
+            
+            before = threading.active_count()
+            with mock.patch.object(clean_mac.ParallelTreeRemover, "_worker", worker):
+                with self.assertRaises(KeyboardInterrupt):
+                    clean_mac.parallel_rmtree(root, workers=4)
+            self.assertEqual(threading.active_count(), before)
+    
+    def test_parallel_rmtree_collects_errors_per_path(self):
+        """Test that one failing file only keeps its own ancestors"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "Cache")
+            os.mkdir(root)
+            self._make_tree(root, depth=2)
+            stuck = os.path.join(root, "d1", "d2", "f0")
+            stuck_dir = os.stat(os.path.dirname(stuck))
+            real_unlink = os.unlink
+            
+            def unlink(path, *args, dir_fd=None, **kwargs):
+                # Matches both full paths and names relative to an open directory
+                in_stuck_dir = dir_fd is None or os.path.samestat(os.fstat(dir_fd), stuck_dir)
+                if in_stuck_dir and os.path.join(os.path.dirname(stuck), path) == stuck:
+                    raise PermissionError("Operation not permitted")
+                return real_unlink(path, *args, dir_fd=dir_fd, **kwargs)
+            
+            with mock.patch.object(clean_mac.os, "unlink", unlink):
+                result = clean_mac.parallel_rmtree(root, workers=3)
+                with self.assertRaises(clean_mac.TreeRemovalError):
+                    clean_mac.remove_tree(root, workers=3)
+            
+            self.assertEqual(list(result.errors), [stuck])
+            self.assertTrue(os.path.exists(stuck))
+            self.assertFalse(os.path.exists(os.path.join(root, "d0")))
+            self.assertEqual(sorted(os.listdir(root)), ["d1"])
+
+    
+    def _shift_device(self, real_stat, root):
+        """Wrap a stat function so that root appears to be on another device"""
+        def fake_stat(path, *args, **kwargs):
+            st = real_stat(path, *args, **kwargs)
+            if os.fspath(path) == root:
+                values = list(st)
+                values[2] += 1  # st_dev
+                return os.stat_result(values)
+            return st
+        return fake_stat
+    
+    def test_get_size_mb_stays_on_one_filesystem(self):
+        """Test that get_size_mb skips and reports subtrees on other devices"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "share"))
+            with open(os.path.join(tmpdir, "share", "big"), "wb") as f:
+                f.write(b"x" * 1024 * 1024)
+            
+            # Pretend tmpdir is on another device, so 'share' looks like a mount point
+            # (faked by path, so this exercises the path-based fallback)
+            with mock.patch.object(clean_mac.os, "stat", self._shift_device(os.stat, tmpdir)), \
+                    mock.patch.object(clean_mac, "FD_RELATIVE", False):
+                skipped = []
+                self.assertEqual(clean_mac.get_size_mb(tmpdir, skipped), 0)
+                self.assertEqual(skipped, [(os.path.join(tmpdir, "share"), 'other filesystem')])
+                self.assertAlmostEqual(clean_mac.get_size_mb(tmpdir, cross_mounts=True), 1)
+    
+    def test_get_size_mb_does_not_follow_symlinks(self):
+        """Test that a symlink to a large directory counts as nothing"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            share = os.path.join(tmpdir, "share")
+            os.mkdir(share)
+            with open(os.path.join(share, "big"), "wb") as f:
+                f.write(b"x" * 1024 * 1024)
+            link = os.path.join(tmpdir, "link")
+            os.symlink(share, link)
+            self.assertEqual(clean_mac.get_size_mb(link), 0)
+            self.assertAlmostEqual(clean_mac.get_size_mb(share), 1)
+    
+    def test_print_detailed_statistics_groups_skipped_by_category(self):
+        """Test that skipped subtrees are listed under their category"""
+        stream = io.StringIO()
+        reporter = clean_mac.ProgressReporter(stream=stream)
+        skipped = {
+            'User Caches': [("/Users/me/Library/Caches/nas", 'other filesystem')] * 2,
+            'Trash': [("/Users/me/.Trash/loop", 'directory cycle')],
+            'User Logs': [],
+        }
+        clean_mac.print_detailed_statistics({}, reporter, skipped)
+        output = stream.getvalue()
+        self.assertIn("Skipped 2 subtree(s)", output)
+        self.assertLess(output.index("Trash:"), output.index("/Users/me/.Trash/loop"))
+        self.assertLess(output.index("User Caches:"), output.index("/Users/me/Library/Caches/nas"))
+        self.assertNotIn("User Logs:", output)
+    
+    def test_parallel_rmtree_keeps_other_filesystems(self):
+        """Test that the remover leaves mount points and their parents in place"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "Caches")
+            os.makedirs(os.path.join(root, "mounted", "data"))
+            with open(os.path.join(root, "local.db"), "w") as f:
+                f.write("x")
+            
+            with mock.patch.object(clean_mac.os, "lstat", self._shift_device(os.lstat, root)), \
+                    mock.patch.object(clean_mac, "FD_RELATIVE", False):
+                result = clean_mac.parallel_rmtree(root, workers=2)
+            self.assertTrue(result.ok)
+            self.assertEqual(result.skipped, [(os.path.join(root, "mounted"), 'other filesystem')])
+            self.assertFalse(os.path.exists(os.path.join(root, "local.db")))
+            self.assertTrue(os.path.isdir(os.path.join(root, "mounted", "data")))
+    
+    @unittest.skipUnless(clean_mac.FD_RELATIVE, "needs fd-relative operations")
+    def test_walk_files_fd_relative_stays_on_one_filesystem(self):
+        """Test that the fwalk-based walk skips other devices and never follows symlinks"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "root", "share"))
+            os.makedirs(os.path.join(tmpdir, "root", "local"))
+            os.makedirs(os.path.join(tmpdir, "outside"))
+            for rel in ("root/share/big", "root/local/small", "outside/secret"):
+                with open(os.path.join(tmpdir, rel), "wb") as f:
+                    f.write(b"x" * 1024)
+            root = os.path.join(tmpdir, "root")
+            os.symlink(os.path.join(tmpdir, "outside"), os.path.join(root, "local", "link"))
+            real_stat = os.stat
+            
+            def fake_stat(path, *args, **kwargs):
+                # 'share' looks like a mount point when looked up relative to its parent
+                st = real_stat(path, *args, **kwargs)
+                if kwargs.get('dir_fd') is not None and path == "share":
+                    values = list(st)
+                    values[2] += 1  # st_dev
+                    return os.stat_result(values)
+                return st
+            
+            with mock.patch.object(clean_mac.os, "stat", fake_stat):
+                skipped = []
+                found = {path: st.st_size for path, st in clean_mac.walk_files(root, skipped)}
+            self.assertEqual(skipped, [(os.path.join(root, "share"), 'other filesystem')])
+            self.assertEqual(sorted(found), [os.path.join(root, "local", "link"),
+                                             os.path.join(root, "local", "small")])
+            self.assertEqual(found[os.path.join(root, "local", "small")], 1024)
+    
+    @unittest.skipUnless(clean_mac.FD_RELATIVE, "needs fd-relative operations")
+    def test_remove_tree_refuses_swapped_directory(self):
+        """Test that a directory replaced by a symlink after its check is not followed"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            victim = os.path.join(tmpdir, "victim")
+            os.mkdir(victim)
+            with open(os.path.join(victim, "keep"), "w") as f:
+                f.write("x")
+            target = os.path.join(tmpdir, "old-build")
+            os.mkdir(target)
+            checked = os.lstat(target)
+            
+            # Swap the checked directory for a symlink to somewhere else
+            os.rmdir(target)
+            os.symlink(victim, target)
+            with self.assertRaises(OSError):
+                clean_mac.remove_tree(target, expected=checked)
+            with self.assertRaises(OSError):
+                clean_mac.open_dir_nofollow(target)
+            self.assertTrue(os.path.exists(os.path.join(victim, "keep")))
+            
+            # Relative to an open handle, an unchanged directory is removed as usual
+            os.unlink(target)
+            self._make_tree(victim, depth=2)
+            with clean_mac.DirHandle(tmpdir) as handle:
+                entries = dict(handle.entries())
+                handle.remove("victim", entries["victim"])
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_dir_handle_refuses_replaced_file(self):
+        """Test that a file replaced under the same name after its check is not removed"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "old"), "w") as f:
+                f.write("checked")
+            with clean_mac.DirHandle(tmpdir) as handle:
+                checked = dict(handle.entries())["old"]
+                
+                # Move the checked file away and put a fresh one under its name
+                os.rename(os.path.join(tmpdir, "old"), os.path.join(tmpdir, "moved"))
+                with open(os.path.join(tmpdir, "old"), "w") as f:
+                    f.write("fresh")
+                with self.assertRaises(OSError):
+                    handle.remove("old", checked)
+                self.assertTrue(os.path.exists(os.path.join(tmpdir, "old")))
+                
+                handle.remove("moved", dict(handle.entries())["moved"])
+            self.assertEqual(os.listdir(tmpdir), ["old"])
+
+    def test_symlinked_root_is_followed_once(self):
+        """Test that a root reached through a symlink (like /tmp on macOS) is walked and cleaned"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            real = os.path.join(tmpdir, "private", "tmp")
+            os.makedirs(os.path.join(real, "cache"))
+            os.makedirs(os.path.join(tmpdir, "outside"))
+            for rel in ("private/tmp/cache/blob", "outside/secret"):
+                with open(os.path.join(tmpdir, rel), "wb") as f:
+                    f.write(b"x" * 1024)
+            os.symlink(os.path.join(tmpdir, "outside"), os.path.join(real, "cache", "link"))
+            root = os.path.join(tmpdir, "tmp")
+            os.symlink(real, root)
+
+            found = sorted(path for path, _ in clean_mac.walk_files(root))
+            self.assertEqual(found, [os.path.join(root, "cache", "blob"),
+                                     os.path.join(root, "cache", "link")])
+
+            with clean_mac.DirHandle(root) as handle:
+                entries = dict(handle.entries())
+                self.assertEqual(list(entries), ["cache"])
+                self.assertGreaterEqual(handle.size_mb("cache", entries["cache"]), 1024 / (1024 * 1024))
+                handle.remove("cache", entries["cache"])
+            self.assertEqual(os.listdir(real), [])
+            self.assertTrue(os.path.islink(root))
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "outside", "secret")))
+
+    def test_is_foreign_mount_respects_cross_mount_roots(self):
+        """Test is_foreign_mount with and without a cross-mount root"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            other_dev = os.stat(tmpdir).st_dev + 1
+            skipped = []
+            self.assertTrue(clean_mac.is_foreign_mount(tmpdir, other_dev, skipped))
+            self.assertEqual(skipped, [(tmpdir, 'other filesystem')])
+            self.assertFalse(clean_mac.is_foreign_mount(tmpdir, os.stat(tmpdir).st_dev))
+            
+            clean_mac.CROSS_MOUNT_ROOTS.add(os.path.dirname(tmpdir))
+            try:
+                self.assertFalse(clean_mac.is_foreign_mount(tmpdir, other_dev))
+            finally:
+                clean_mac.CROSS_MOUNT_ROOTS.discard(os.path.dirname(tmpdir))
+    
+    def test_cross_mount_root_below_walk_root(self):
+        """Test that a --cross-mounts root inside the walked directory is entered"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, "foo")
+            for rel in ("nas/data/big", "local/small"):
+                os.makedirs(os.path.dirname(os.path.join(root, rel)), exist_ok=True)
+                with open(os.path.join(root, rel), "wb") as f:
+                    f.write(b"x" * 1024)
+            nas, local = os.path.join(root, "nas"), os.path.join(root, "local")
+            
+            # Shifting root's device makes both subdirectories look like mount points
+            clean_mac.CROSS_MOUNT_ROOTS.add(nas)
+            try:
+                with mock.patch.object(clean_mac.os, "stat", self._shift_device(os.stat, root)), \
+                        mock.patch.object(clean_mac, "FD_RELATIVE", False):
+                    skipped = []
+                    found = [path for path, _ in clean_mac.walk_files(root, skipped)]
+                self.assertEqual(found, [os.path.join(nas, "data", "big")])
+                self.assertEqual(skipped, [(local, 'other filesystem')])
+                
+                with mock.patch.object(clean_mac.os, "lstat", self._shift_device(os.lstat, root)), \
+                        mock.patch.object(clean_mac, "FD_RELATIVE", False):
+                    result = clean_mac.parallel_rmtree(root, workers=2)
+                self.assertEqual(result.skipped, [(local, 'other filesystem')])
+                self.assertFalse(os.path.exists(nas))
+                self.assertTrue(os.path.exists(os.path.join(local, "small")))
+            finally:
+                clean_mac.CROSS_MOUNT_ROOTS.discard(nas)
+
+    
+    def test_maintain_logs_rotates_compresses_and_expires(self):
+        """Test that maintain_logs keeps recent logs and reports both kinds of savings"""
+        import gzip
+        import tempfile
+        import time
+        from unittest import mock
+        day = 86400
+        now = time.time()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def write(name, data, age_days):
+                path = os.path.join(tmpdir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                os.utime(path, (now - age_days * day, now - age_days * day))
+                return path
+            
+            old_log = write("App/old.log", b"request handled\n" * 2000, 3)
+            active_log = write("App/current.log", b"still writing\n" * 200000, 0)
+            quiet_log = write("Other/recent.log", b"hello\n" * 2000, 0)
+            expired = write("App/ancient.log.gz", b"x" * 5000, 45)
+            kept_archive = write("App/last-week.log.gz", b"x" * 5000, 7)
+            
+            stats = {'items_removed': 0, 'space_freed': 0}
+            with mock.patch.object(clean_mac, "LOG_ROTATE_THRESHOLD_MB", 1):
+                freed = clean_mac.maintain_logs(tmpdir, stats, workers=2, now=now)
+            
+            # Old log compressed with its contents and mtime preserved
+            self.assertFalse(os.path.exists(old_log))
+            with gzip.open(old_log + ".gz") as f:
+                self.assertEqual(f.read(), b"request handled\n" * 2000)
+            self.assertAlmostEqual(os.stat(old_log + ".gz").st_mtime, now - 3 * day, places=0)
+            
+            # Active log rotated into an archive and truncated in place
+            self.assertEqual(os.path.getsize(active_log), 0)
+            rotated = [n for n in os.listdir(os.path.join(tmpdir, "App"))
+                       if n.startswith("current.log.") and n.endswith(".gz")]
+            self.assertEqual(len(rotated), 1)
+            
+            self.assertTrue(os.path.exists(quiet_log))
+            self.assertTrue(os.path.exists(kept_archive))
+            self.assertFalse(os.path.exists(expired))
+            
+            self.assertEqual(stats['items_removed'], 1)
+            self.assertEqual(stats['items_compressed'], 2)
+            self.assertAlmostEqual(stats['deleted_space'], 5000 / (1024 * 1024))
+            self.assertGreater(stats['compressed_space'], 0)
+            self.assertAlmostEqual(freed, stats['compressed_space'] + stats['deleted_space'])
+    
+    def test_maintain_logs_survives_worker_failures(self):
+        """Test that a failing compression pool is reported, not raised"""
+        import tempfile
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        day = 86400
+        now = time.time()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, age_days in (("old.log", 3), ("ancient.log.gz", 45)):
+                path = os.path.join(tmpdir, name)
+                with open(path, "wb") as f:
+                    f.write(b"line\n" * 2000)
+                os.utime(path, (now - age_days * day, now - age_days * day))
+            
+            def broken(*args):
+                raise RuntimeError("worker process died")
+            
+            stream = io.StringIO()
+            reporter = clean_mac.ProgressReporter(stream=stream)
+            stats = {'items_removed': 0, 'space_freed': 0}
+            with mock.patch.object(clean_mac, "ProcessPoolExecutor", ThreadPoolExecutor), \
+                    mock.patch.object(clean_mac, "compress_log", broken):
+                clean_mac.maintain_logs(tmpdir, stats, reporter, now=now)
+            self.assertIn("Could not compress", stream.getvalue())
+            self.assertEqual(stats['items_removed'], 1)
+            
+            with mock.patch.object(clean_mac, "walk_files", side_effect=PermissionError("denied")):
+                self.assertEqual(clean_mac.maintain_logs(tmpdir, reporter=reporter), 0)
+            self.assertIn("✗ User Logs: Error - denied", stream.getvalue())
+    
+    def test_compress_log_streams_large_files(self):
+        """Test that compress_log produces the same archive through the streaming path"""
+        import gzip
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "big.log")
+            with open(path, "wb") as f:
+                f.write(b"line\n" * 100000)
+            result_path, original, compressed, error = clean_mac.compress_log(path, stream_threshold_mb=0)
+            self.assertIsNone(error)
+            self.assertEqual(result_path, path)
+            self.assertEqual(original, 500000)
+            self.assertLess(compressed, original)
+            with gzip.open(path + ".gz") as f:
+                self.assertEqual(f.read(), b"line\n" * 100000)
 
+    
+    def test_plan_budgeted_clean_prefers_high_yield_targets(self):
+        """Test that the planner orders by MB/s and respects both budgets"""
+        mb = 1024 * 1024
+        throughput = {'Trash': 100 * mb, 'User Caches': 10 * mb}
+        targets = [
+            {'category': 'User Caches', 'path': '/c/big', 'name': 'big', 'size': 500},
+            {'category': 'Trash', 'path': '/t/big', 'name': 'big', 'size': 400},
+            {'category': 'Trash', 'path': '/t/small', 'name': 'small', 'size': 50},
+            {'category': 'Trash', 'path': '/t/tiny', 'name': 'tiny', 'size': 0.01},
+        ]
+        
+        plan = clean_mac.plan_budgeted_clean(targets, throughput=throughput)
+        self.assertEqual([t['path'] for t in plan['selected']],
+                         ['/t/big', '/t/small', '/c/big', '/t/tiny'])
+        
+        plan = clean_mac.plan_budgeted_clean(targets, space_goal_mb=420, throughput=throughput)
+        self.assertEqual([t['path'] for t in plan['selected']], ['/t/big', '/t/small'])
+        self.assertEqual({r for _, r in plan['skipped']}, {'space goal met'})
+        
+        # 10 s allows both Trash items (~4.5 s) but not the 50 s cache entry
+        plan = clean_mac.plan_budgeted_clean(targets, time_budget_s=10, throughput=throughput)
+        self.assertEqual([t['path'] for t in plan['selected']], ['/t/big', '/t/small', '/t/tiny'])
+        self.assertEqual([(t['path'], r) for t, r in plan['skipped']], [('/c/big', 'over time budget')])
+    
+    def test_execute_clean_plan_stops_at_space_goal(self):
+        """Test that execution stops once the space goal is met and reports the rest"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            targets = []
+            for name, size_mb in (("a", 3), ("b", 2), ("c", 1)):
+                path = os.path.join(tmpdir, name)
+                os.mkdir(path)
+                with open(os.path.join(path, "data"), "wb") as f:
+                    f.write(b"x" * size_mb * 1024 * 1024)
+                targets.append({'category': 'Trash', 'path': path, 'name': name, 'size': size_mb})
+            
+            plan = clean_mac.plan_budgeted_clean(targets)
+            reporter = clean_mac.ProgressReporter(stream=io.StringIO())
+            freed, elapsed, rates, skipped = clean_mac.execute_clean_plan(
+                plan, space_goal_mb=4, reporter=reporter)
+            
+            self.assertEqual(freed, 5)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["c"])
+            self.assertEqual([(t['name'], r) for t, r in skipped], [("c", 'space goal met')])
+            self.assertIn('Trash', rates)
+    
+    def test_estimate_seconds_counts_files(self):
+        """Test that a small tree of many files is estimated by its file count"""
+        target = {'category': 'User Caches', 'path': '/c/npm', 'name': 'npm', 'size': 1}
+        self.assertLess(clean_mac.estimate_seconds(target, {}), 0.1)
+        target['files'] = 100000
+        self.assertGreaterEqual(clean_mac.estimate_seconds(target, {}),
+                                100000 / clean_mac.DEFAULT_UNLINKS_PER_S)
+    
+    def test_execute_clean_plan_stops_inside_target_over_budget(self):
+        """Test that a tree larger than the time budget is stopped part-way"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            big = os.path.join(tmpdir, "DerivedData")
+            os.mkdir(big)
+            file_count, _ = self._make_tree(big, depth=3, fanout=4, files=60)
+            small = os.path.join(tmpdir, "small")
+            with open(small, "w") as f:
+                f.write("x")
+            
+            # A deadline that has passed stops the remover before it starts
+            result = clean_mac.parallel_rmtree(big, workers=2, deadline=time.monotonic() - 1)
+            self.assertTrue(result.timed_out)
+            self.assertEqual(result.files_removed, 0)
+            
+            # Planned as tiny, but thousands of files cannot go in 20 ms
+            targets = [{'category': 'User Caches', 'path': big, 'name': 'DerivedData', 'size': 0.001},
+                       {'category': 'User Caches', 'path': small, 'name': 'small', 'size': 0.001}]
+            plan = clean_mac.plan_budgeted_clean(targets, time_budget_s=0.02)
+            self.assertEqual(len(plan['selected']), 2)
+            reporter = clean_mac.ProgressReporter(stream=io.StringIO())
+            freed, elapsed, rates, skipped = clean_mac.execute_clean_plan(
+                plan, time_budget_s=0.02, reporter=reporter)
+            
+            self.assertEqual(freed, 0)
+            self.assertLess(elapsed, 1)
+            self.assertEqual([(t['name'], r) for t, r in skipped],
+                             [('DerivedData', 'time budget used up'), ('small', 'time budget used up')])
+            remaining = sum(len(files) for _, _, files in os.walk(big))
+            self.assertTrue(0 < remaining < file_count)
+            self.assertTrue(os.path.exists(small))
+    
+    def test_collect_clean_targets_bounds_the_scan(self):
+        """Test that after the scan deadline only cached or recorded sizes are used"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as home:
+            caches = os.path.join(home, "Library", "Caches")
+            for name in ("com.example.cached", "com.example.known", "com.example.new"):
+                os.makedirs(os.path.join(caches, name))
+                with open(os.path.join(caches, name, "blob"), "wb") as f:
+                    f.write(b"x" * 1024 * 1024)
+            cache = clean_mac.SizeCache()
+            clean_mac.get_size_mb(os.path.join(caches, "com.example.cached"), size_cache=cache)
+            
+            skipped, sizes = {}, {}
+            with mock.patch.dict(os.environ, {'HOME': home}):
+                targets = clean_mac.collect_clean_targets(
+                    clean_mac.ProgressReporter(stream=io.StringIO()), skipped=skipped,
+                    size_cache=cache, sizes=sizes, deadline=time.monotonic() - 1,
+                    known_sizes={'User Caches/com.example.known': 5 * 1024 * 1024})
+            
+            found = {t['name']: t['size'] for t in targets if t['category'] == 'User Caches'}
+            self.assertEqual(found, {'com.example.cached': 1, 'com.example.known': 5})
+            self.assertIn((os.path.join(caches, "com.example.new"), 'not measured within the time budget'),
+                          skipped['User Caches'])
+            self.assertNotIn('User Caches', sizes)
+    
+    def test_size_history_throughput(self):
+        """Test that recorded throughput is summarised as a per-category median"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = clean_mac.SizeHistory(os.path.join(tmpdir, "history.jsonl"))
+            for i, rate in enumerate((100, 300, 200)):
+                history.append({}, timestamp=1_000_000_000 + i, throughput={'Trash': rate})
+            self.assertEqual(history.throughput(now=1_000_000_010), {'Trash': 200})
+
+    
+    def test_cleaner_engine_reports_through_callbacks(self):
+        """Test that CleanerEngine sends events and progress to callbacks, not stdout"""
+        import tempfile
+        import contextlib
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as home:
+            for name in ("com.example.one", "com.example.two"):
+                os.makedirs(os.path.join(home, "Library", "Caches", name))
+                with open(os.path.join(home, "Library", "Caches", name, "blob"), "wb") as f:
+                    f.write(b"x" * 1024 * 1024)
+            os.makedirs(os.path.join(home, ".Trash"))
+            
+            events, progress = [], []
+            engine = clean_mac.CleanerEngine(on_progress=progress.append,
+                                             on_event=lambda kind, payload: events.append(kind))
+            stdout = io.StringIO()
+            with mock.patch.dict(os.environ, {'HOME': home}), contextlib.redirect_stdout(stdout):
+                result = engine.clean(categories=['Trash', 'User Caches'])
+            
+            self.assertEqual(stdout.getvalue(), "")
+            self.assertEqual(os.listdir(os.path.join(home, "Library", "Caches")), [])
+            self.assertEqual(result['categories']['User Caches']['items'], 2)
+            self.assertIn('start', events)
+            self.assertIn('finish', events)
+            self.assertEqual(progress[-1]['items'], 2)
+            self.assertEqual(engine.stats()['runs'], 1)
+
+    def test_cleaner_engine_throughput_times_removal_only(self):
+        """Test that regular runs leave the size scan out of the measured throughput"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as home:
+            for name in ("com.example.one", "com.example.two"):
+                os.makedirs(os.path.join(home, "Library", "Caches", name))
+                with open(os.path.join(home, "Library", "Caches", name, "blob"), "wb") as f:
+                    f.write(b"x" * 1024 * 1024)
+            real_get_size_mb = clean_mac.get_size_mb
+
+            def slow_get_size_mb(*args, **kwargs):
+                time.sleep(0.25)
+                return real_get_size_mb(*args, **kwargs)
+
+            engine = clean_mac.CleanerEngine(on_event=lambda kind, payload: None)
+            with mock.patch.dict(os.environ, {'HOME': home}), \
+                    mock.patch.object(clean_mac, 'get_size_mb', slow_get_size_mb):
+                result = engine.clean(categories=['User Caches'])
+
+            self.assertEqual(result['freed_mb'], 2)
+            self.assertGreater(result['throughput']['User Caches'], 2 * 1024 * 1024 / 0.25)
+
+    def test_budgeted_clean_records_sizes_in_history(self):
+        """Test that budgeted runs record before/after sizes so growth stays correct"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as home:
+            trash = os.path.join(home, ".Trash")
+            os.makedirs(trash)
+
+            def add_to_trash(name, mb):
+                with open(os.path.join(trash, name), "wb") as f:
+                    f.write(b"x" * mb * 1024 * 1024)
+
+            history = clean_mac.SizeHistory(os.path.join(home, "history.jsonl"))
+            engine = clean_mac.CleanerEngine(on_event=lambda kind, payload: None, history=history)
+            with mock.patch.dict(os.environ, {'HOME': home}):
+                add_to_trash("a", 2)
+                engine.clean(categories=['Trash'])
+
+                add_to_trash("b", 3)
+                plan = engine.plan(space_goal_mb=1024)
+                plan['selected'] = [t for t in plan['selected'] if t['category'] == 'Trash']
+                engine.clean(plan=plan)
+                self.assertEqual(os.listdir(trash), [])
+                budgeted = history.load()[-1]
+                self.assertEqual(budgeted['s']['Trash'], 3 * 1024 * 1024)
+                self.assertEqual(budgeted['b']['Trash'], 0)
+
+                add_to_trash("c", 1)
+                engine.clean(categories=['Trash'])
+
+            self.assertEqual(history.load()[-1]['c']['Trash'], 4 * 1024 * 1024)
+
+    def test_size_cache_reused_until_directory_changes(self):
+        """Test that get_size_mb reuses cached sizes and notices changed directories"""
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "a"), "wb") as f:
+                f.write(b"x" * 1024 * 1024)
+            cache = clean_mac.SizeCache()
+            walks = []
+            real_walk = clean_mac.walk_files
+            
+            def counting_walk(*args, **kwargs):
+                walks.append(args[0])
+                return real_walk(*args, **kwargs)
+            
+            with mock.patch.object(clean_mac, 'walk_files', counting_walk):
+                self.assertEqual(clean_mac.get_size_mb(tmpdir, size_cache=cache), 1)
+                self.assertEqual(clean_mac.get_size_mb(tmpdir, size_cache=cache), 1)
+                self.assertEqual(len(walks), 1)
+                
+                with open(os.path.join(tmpdir, "b"), "wb") as f:
+                    f.write(b"x" * 1024 * 1024)
+                os.utime(tmpdir, ns=(0, 1))  # coarse mtimes may not have moved on
+                self.assertEqual(clean_mac.get_size_mb(tmpdir, size_cache=cache), 2)
+                self.assertEqual(len(walks), 2)
+                
+                cache.invalidate(tmpdir)
+                self.assertEqual(len(cache), 0)
+    
+    def test_is_system_file_compiled_rules(self):
+        """Test that the compiled protection rules match prefixes and patterns"""
+        self.assertTrue(clean_mac.is_system_file("com.apple.Safari"))
+        self.assertTrue(clean_mac.is_system_file("COM.APPLE.finder"))
+        self.assertFalse(clean_mac.is_system_file("com.example.app"))
+        
+        self.assertFalse(clean_mac.is_system_file("org.keepme.cache"))
+        
+        original = list(clean_mac.SYSTEM_SKIP_PATTERNS)
+        try:
+            clean_mac.SYSTEM_SKIP_PATTERNS.append("keepme")
+            self.assertTrue(clean_mac.is_system_file("org.keepme.cache"))
+        finally:
+            clean_mac.SYSTEM_SKIP_PATTERNS[:] = original
+        self.assertFalse(clean_mac.is_system_file("org.keepme.cache"))
 
 if __name__ == "__main__":
     print("Running Mac Cleaner tests...")